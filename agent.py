@@ -1,5 +1,5 @@
 from chatbot.rag import RAGSystem
-from langchain_groq import ChatGroq
+from chatbot.llm_gateway import get_gateway, LLMUnavailableError
 from langchain.prompts import ChatPromptTemplate
 from langchain.output_parsers import PydanticOutputParser
 from pydantic import BaseModel, Field
@@ -27,11 +27,8 @@ class FoodOrderAgent:
         self.rag_system = RAGSystem(menu_file, groq_api_key)
         self.current_order = []
         #self.last_suggested_item = None
-        self.llm = ChatGroq(
-            api_key=groq_api_key,
-            temperature=0.1,
-            model_name="llama3-70b-8192"
-        )
+        self.gateway = get_gateway(groq_api_key)
+        self.llm = self.gateway.get_chat_model("llama3-70b-8192", temperature=0.1)
     
         self.intent_prompt = ChatPromptTemplate.from_messages([
             ("system", """You are a restaurant order assistant. Analyze the user input and classify the intent.
@@ -108,7 +105,16 @@ class FoodOrderAgent:
         menu_context = self._get_relevant_context(user_input)
         
         # Analyze intent using LLM with chat history
-        intent = self._analyze_intent(user_input, menu_context, chat_history)
+        try:
+            intent = self._analyze_intent(user_input, menu_context, chat_history)
+        except LLMUnavailableError as e:
+            print("LLM unavailable in analyze_intent: ", e)
+
+            # Answer from the menu directly instead of calling the LLM again
+            matching_items = self._find_matching_items(user_input.lower())
+            if matching_items:
+                return self._format_matching_items(matching_items)
+            return self.rag_system.fallback_response()
         
         if intent.intent_type == IntentType.ORDER:
             print("current_order in order intent: ", self.current_order)
@@ -140,23 +146,25 @@ class FoodOrderAgent:
             matching_items = self._find_matching_items(user_input.lower())
             print("in query intent : ", matching_items)            
             if matching_items:
-                if len(matching_items) == 1:
-                    # If only one item matches, suggest it
-                    #self.last_suggested_item = matching_items[0]
-                    return (f"We have the {matching_items[0]['name']}, {matching_items[0]['description']} "
-                           f"for ₹{matching_items[0]['price']}. Would you like to order this?")
-                else:
-                    # If multiple items match, list them all
-                    response = "Here are the options available:\n\n"
-                    for item in matching_items:
-                        response += f"• {item['name']} - ₹{item['price']}\n"
-                        response += f"  {item['description']}\n\n"
-                    response += "Which one would you like to order?"
-                    return response
+                return self._format_matching_items(matching_items)
             return self._handle_menu_inquiry(intent.query_details)
         else:
             return self._handle_general_query(intent.query_details)
         
+    def _format_matching_items(self, matching_items: List[dict]) -> str:
+        if len(matching_items) == 1:
+            # If only one item matches, suggest it
+            #self.last_suggested_item = matching_items[0]
+            return (f"We have the {matching_items[0]['name']}, {matching_items[0]['description']} "
+                   f"for ₹{matching_items[0]['price']}. Would you like to order this?")
+
+        # If multiple items match, list them all
+        response = "Here are the options available:\n\n"
+        for item in matching_items:
+            response += f"• {item['name']} - ₹{item['price']}\n"
+            response += f"  {item['description']}\n\n"
+        response += "Which one would you like to order?"
+        return response
 
 
     def _analyze_intent(self, user_input: str, menu_context: str, chat_history: str) -> Intent:
@@ -187,12 +195,13 @@ class FoodOrderAgent:
             menu_context=menu_context,
             chat_history=chat_history
         )
-        response = self.llm.predict_messages(prompt)
+        # LLMUnavailableError propagates so process_order can skip further LLM calls
+        response = self.gateway.predict_messages(self.llm, prompt)
         print("response in analyze_intent: ", response)
         
         try:
             # Parse the JSON response
-            intent = self.parser.parse(response.content)
+            intent = self.parser.parse(response)
             return intent
         except Exception as e:
             print("JSON parsing failed: ", e)
@@ -250,8 +259,11 @@ class FoodOrderAgent:
             ("system", f"Context: {context}")
         ])
         
-        response = self.llm.predict_messages(prompt)
-        return response.content
+        try:
+            return self.gateway.predict_messages(self.llm, prompt.format_messages())
+        except LLMUnavailableError as e:
+            print("LLM unavailable in handle_menu_inquiry: ", e)
+            return self.rag_system.fallback_response()
 
     def _handle_general_query(self, query_details: str) -> str:
         # Use RAG for general queries
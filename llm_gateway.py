@@ -0,0 +1,305 @@
+import os
+import time
+import random
+import hashlib
+import json
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Optional
+
+import groq
+import httpx
+from langchain_groq import ChatGroq
+
+
+# HTTP status codes worth retrying: rate limited, timeouts and upstream errors
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMUnavailableError(Exception):
+    """Raised when the LLM cannot be reached (circuit open, deadline passed or non-retryable error)"""
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting the rate of upstream requests"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, deadline):
+        """Block until a token is available; return False if the deadline passes first"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures and lets a single trial call through after the cooldown"""
+
+    def __init__(self, failure_threshold, cooldown):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_progress = False
+        self.lock = threading.Lock()
+
+    def is_open(self):
+        """Return True while the breaker is open and still cooling down"""
+        with self.lock:
+            return self.opened_at is not None and time.monotonic() - self.opened_at < self.cooldown
+
+    def allow_request(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.cooldown or self.trial_in_progress:
+                return False
+            # Half-open: allow one trial request
+            self.trial_in_progress = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_progress = False
+
+    def release_trial(self):
+        """Free the half-open slot without recording an outcome"""
+        with self.lock:
+            self.trial_in_progress = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_progress = False
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    print(f"LLM circuit breaker opened after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+
+
+class LLMGateway:
+    """Process-wide gateway for all Groq calls.
+
+    Shares one HTTP connection pool between the Groq SDK client and the
+    ChatGroq models, bounds concurrent calls with a semaphore, rate limits
+    them with a token bucket, coalesces identical in-flight prompts into a
+    single upstream call, and retries transient failures with jittered
+    backoff until a deadline. A circuit breaker stops calling upstream after
+    repeated failures so callers can fall back to templated responses.
+    """
+
+    def __init__(self, groq_api_key, max_concurrency=4, requests_per_second=0.5, burst=5,
+                 retry_deadline=30.0, base_backoff=0.5, max_backoff=8.0,
+                 failure_threshold=5, cooldown=30.0, request_timeout=20.0):
+        self.groq_api_key = groq_api_key
+        self.retry_deadline = retry_deadline
+        self.request_timeout = request_timeout
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        # Shared connection pool; retries are handled here, not by the SDKs
+        self.http_client = httpx.Client(
+            timeout=request_timeout,
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+        )
+        self.client = groq.Groq(api_key=groq_api_key, http_client=self.http_client, max_retries=0)
+        self.chat_models: Dict[tuple, ChatGroq] = {}
+
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.rate_limiter = TokenBucket(requests_per_second, burst)
+        self.circuit_breaker = CircuitBreaker(failure_threshold, cooldown)
+
+        self.in_flight: Dict[str, Future] = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, groq_api_key):
+        return cls(
+            groq_api_key,
+            max_concurrency=_positive_env('LLM_MAX_CONCURRENCY', 4, int),
+            requests_per_second=_positive_env('LLM_REQUESTS_PER_SECOND', 0.5, float),
+            burst=_positive_env('LLM_BURST', 5, int),
+            retry_deadline=_positive_env('LLM_RETRY_DEADLINE', 30, float),
+            failure_threshold=_positive_env('LLM_BREAKER_THRESHOLD', 5, int),
+            cooldown=_positive_env('LLM_BREAKER_COOLDOWN', 30, float),
+            request_timeout=_positive_env('LLM_REQUEST_TIMEOUT', 20, float),
+        )
+
+    def get_chat_model(self, model_name, temperature=0.1) -> ChatGroq:
+        """Return a shared ChatGroq model that uses the gateway's connection pool"""
+        key = (model_name, temperature)
+        with self.lock:
+            if key not in self.chat_models:
+                self.chat_models[key] = ChatGroq(
+                    api_key=self.groq_api_key,
+                    temperature=temperature,
+                    model_name=model_name,
+                    http_client=self.http_client,
+                    # ChatGroq's default timeout of None would override the shared client's
+                    request_timeout=self.request_timeout,
+                    max_retries=0
+                )
+            return self.chat_models[key]
+
+    def chat_completion(self, messages, model) -> str:
+        """Call the Groq chat completions API and return the message content"""
+        def call():
+            response = self.client.chat.completions.create(model=model, messages=messages)
+            return response.choices[0].message.content.strip()
+
+        return self._execute(self._coalescing_key(model, 0, messages), call)
+
+    def predict_messages(self, llm: ChatGroq, messages) -> str:
+        """Invoke a ChatGroq model with LangChain messages and return the content"""
+        payload = [{"role": message.type, "content": message.content} for message in messages]
+        key = self._coalescing_key(llm.model_name, llm.temperature, payload)
+        return self._execute(key, lambda: llm.invoke(messages).content)
+
+    def _coalescing_key(self, model, temperature, messages):
+        raw = json.dumps([model, temperature, messages], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _execute(self, key, call: Callable[[], Any]):
+        """Run call once per key; concurrent callers with the same key share the result"""
+        with self.lock:
+            future = self.in_flight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self.in_flight[key] = future
+
+        if not is_leader:
+            # The leader's last attempt may start just before the deadline
+            try:
+                return future.result(timeout=self.retry_deadline + self.request_timeout)
+            except FutureTimeoutError:
+                raise LLMUnavailableError("Timed out waiting for a coalesced LLM call")
+
+        try:
+            future.set_result(self._call_with_retry(call))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self.lock:
+                self.in_flight.pop(key, None)
+        return future.result()
+
+    def _call_with_retry(self, call: Callable[[], Any]):
+        deadline = time.monotonic() + self.retry_deadline
+        attempt = 0
+        while True:
+            try:
+                return self._attempt(call, deadline)
+            except LLMUnavailableError:
+                raise
+            except Exception as e:
+                delay = self._retry_after(e)
+                if delay is None:
+                    # Exponential backoff with full jitter
+                    delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+                if time.monotonic() + delay > deadline:
+                    raise LLMUnavailableError(f"LLM call failed after {attempt + 1} attempts: {e}") from e
+
+                print(f"LLM call failed ({e}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+                attempt += 1
+
+    def _attempt(self, call: Callable[[], Any], deadline):
+        """Make one upstream call; retryable errors are re-raised, all others become LLMUnavailableError"""
+        if self.circuit_breaker.is_open():
+            raise LLMUnavailableError("LLM circuit breaker is open")
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not self.semaphore.acquire(timeout=remaining):
+            raise LLMUnavailableError("Timed out waiting for a free LLM slot")
+        try:
+            # Take the rate limit token only once a slot is held so it is not wasted while queued
+            if not self.rate_limiter.acquire(deadline):
+                raise LLMUnavailableError("Rate limit wait exceeded the retry deadline")
+            if not self.circuit_breaker.allow_request():
+                raise LLMUnavailableError("LLM circuit breaker is open")
+
+            try:
+                result = call()
+            except Exception as e:
+                if self._is_retryable(e):
+                    if self._is_upstream_failure(e):
+                        self.circuit_breaker.record_failure()
+                    else:
+                        # Rate limits and conflicts are backed off, not counted against the breaker
+                        self.circuit_breaker.release_trial()
+                    raise
+                if isinstance(e, groq.APIStatusError):
+                    # Upstream answered, so the failure says nothing about its health
+                    self.circuit_breaker.record_success()
+                else:
+                    self.circuit_breaker.release_trial()
+                raise LLMUnavailableError(f"LLM call failed: {e}") from e
+            except BaseException:
+                self.circuit_breaker.release_trial()
+                raise
+
+            self.circuit_breaker.record_success()
+            return result
+        finally:
+            self.semaphore.release()
+
+    def _is_retryable(self, error):
+        # APIConnectionError also covers APITimeoutError
+        if isinstance(error, (httpx.TransportError, groq.APIConnectionError)):
+            return True
+        if isinstance(error, groq.APIStatusError):
+            return error.status_code in RETRYABLE_STATUS_CODES
+        return False
+
+    def _is_upstream_failure(self, error):
+        """Return True for errors that indicate Groq is unhealthy: connection failures, timeouts and 5xx"""
+        if isinstance(error, (httpx.TransportError, groq.APIConnectionError)):
+            return True
+        if isinstance(error, groq.APIStatusError):
+            return error.status_code == 408 or error.status_code >= 500
+        return False
+
+    def _retry_after(self, error) -> Optional[float]:
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None) or {}
+        try:
+            return float(headers.get('retry-after'))
+        except (TypeError, ValueError):
+            return None
+
+
+def _positive_env(name, default, cast):
+    value = cast(os.getenv(name, default))
+    if value <= 0:
+        raise ValueError(f"{name} must be greater than 0, got {value}")
+    return value
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway(groq_api_key) -> LLMGateway:
+    """Return the process-wide LLM gateway, creating it on first use"""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway.from_env(groq_api_key)
+        return _gateway
@@ -1,7 +1,7 @@
 import json
 from typing import List, Dict
 import os
-from groq import Groq
+from chatbot.llm_gateway import get_gateway
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain.text_splitter import RecursiveCharacterTextSplitter
@@ -13,8 +13,8 @@ class RAGSystem():
         
         def __init__(self, menu_file, groq_api_key):
 
-            # Initialize Groq client
-            self.client = Groq(api_key=groq_api_key)
+            # Shared LLM gateway (connection pool, rate limiting, retries)
+            self.gateway = get_gateway(groq_api_key)
         
             # Load menu data
             with open(file_path, 'r') as f:
@@ -79,10 +79,17 @@ class RAGSystem():
                 }
                 ]
 
-                response = self.client.chat.completions.create(model="llama-3.3-70b-versatile",messages=messages)
-                return response.choices[0].message.content.strip()
+                return self.gateway.chat_completion(messages, model="llama-3.3-70b-versatile")
             except Exception as e:
                 print(f"Exception raised due to {e}")
+                return self.fallback_response()
+
+        def fallback_response(self):
+            response = "Sorry, I'm having trouble answering that right now. Here's our menu:\n\n"
+            for item in self.menu_data['items']:
+                response += f"• {item['name']} - ₹{item['price']}\n"
+            response += "\nWhat would you like to order?"
+            return response
 
         
         def process_query(self, query):
@@ -0,0 +1,195 @@
+import threading
+import time
+
+import groq
+import httpx
+import pytest
+from langchain_core.messages import HumanMessage
+
+import llm_gateway
+from llm_gateway import CircuitBreaker, LLMGateway, LLMUnavailableError
+
+
+def make_gateway(**kwargs):
+    options = dict(requests_per_second=100, burst=100, retry_deadline=2.0,
+                   base_backoff=0.01, max_backoff=0.05)
+    options.update(kwargs)
+    return LLMGateway("test-key", **options)
+
+
+def rate_limit_error(retry_after=None):
+    headers = {'retry-after': str(retry_after)} if retry_after is not None else {}
+    response = httpx.Response(429, headers=headers, request=httpx.Request('POST', 'https://api.groq.com'))
+    return groq.RateLimitError("rate limited", response=response, body=None)
+
+
+def server_error():
+    response = httpx.Response(503, request=httpx.Request('POST', 'https://api.groq.com'))
+    return groq.InternalServerError("service unavailable", response=response, body=None)
+
+
+def test_identical_concurrent_calls_are_coalesced():
+    gateway = make_gateway()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def call():
+        calls.append(1)
+        started.set()
+        release.wait(1)
+        return "menu answer"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(gateway._execute("key", call)))
+    leader.start()
+    started.wait(1)
+    followers = [threading.Thread(target=lambda: results.append(gateway._execute("key", call)))
+                 for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(2)
+
+    assert calls == [1]
+    assert results == ["menu answer"] * 5
+    assert gateway.in_flight == {}
+
+
+def test_circuit_breaker_opens_allows_one_trial_and_closes():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=0.05)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert not breaker.allow_request()
+
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.allow_request()
+    assert not breaker.is_open()
+
+
+def test_gateway_fails_fast_while_circuit_is_open():
+    gateway = make_gateway(failure_threshold=1, cooldown=60)
+
+    def call():
+        raise server_error()
+
+    with pytest.raises(LLMUnavailableError):
+        gateway._call_with_retry(call)
+    with pytest.raises(LLMUnavailableError, match="circuit breaker is open"):
+        gateway._call_with_retry(lambda: "unused")
+
+
+def test_rate_limit_timeout_releases_half_open_trial():
+    gateway = make_gateway(requests_per_second=1, burst=1, retry_deadline=0.1,
+                           failure_threshold=1, cooldown=0)
+    gateway.circuit_breaker.record_failure()
+    gateway.rate_limiter.tokens = 0
+
+    with pytest.raises(LLMUnavailableError, match="Rate limit wait exceeded"):
+        gateway._call_with_retry(lambda: "unused")
+    assert not gateway.circuit_breaker.trial_in_progress
+
+    gateway.rate_limiter.tokens = 1
+    assert gateway._call_with_retry(lambda: "ok") == "ok"
+
+
+def test_rate_limit_deadline_is_honored():
+    gateway = make_gateway(requests_per_second=0.1, burst=1, retry_deadline=0.2)
+    assert gateway._call_with_retry(lambda: "first") == "first"
+
+    started = time.monotonic()
+    with pytest.raises(LLMUnavailableError, match="Rate limit wait exceeded"):
+        gateway._call_with_retry(lambda: "second")
+    assert time.monotonic() - started < 0.2
+
+
+def test_semaphore_wait_is_bounded_by_deadline():
+    gateway = make_gateway(max_concurrency=1, retry_deadline=0.1)
+    gateway.semaphore.acquire()
+    try:
+        with pytest.raises(LLMUnavailableError, match="free LLM slot"):
+            gateway._call_with_retry(lambda: "unused")
+    finally:
+        gateway.semaphore.release()
+    assert gateway.rate_limiter.tokens > 99
+
+
+def test_retry_after_header_is_respected(monkeypatch):
+    gateway = make_gateway(retry_deadline=5)
+    sleeps = []
+    monkeypatch.setattr(llm_gateway.time, 'sleep', sleeps.append)
+    attempts = []
+
+    def call():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise rate_limit_error(retry_after=1.5)
+        return "ok"
+
+    assert gateway._call_with_retry(call) == "ok"
+    assert sleeps == [1.5]
+
+
+def test_rate_limits_do_not_open_circuit(monkeypatch):
+    gateway = make_gateway(failure_threshold=2, retry_deadline=5)
+    monkeypatch.setattr(llm_gateway.time, 'sleep', lambda delay: None)
+    attempts = []
+
+    def call():
+        attempts.append(1)
+        if len(attempts) <= 4:
+            raise rate_limit_error(retry_after=1)
+        return "ok"
+
+    assert gateway._call_with_retry(call) == "ok"
+    assert gateway.circuit_breaker.failures == 0
+    assert gateway.circuit_breaker.allow_request()
+
+
+def test_chat_model_requests_use_gateway_timeout():
+    gateway = make_gateway(request_timeout=7.0)
+    timeouts = []
+
+    def handler(request):
+        timeouts.append(request.extensions['timeout'])
+        return httpx.Response(200, json={
+            "id": "chatcmpl-1",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "llama3-70b-8192",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "hello"}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        })
+
+    gateway.http_client._transport = httpx.MockTransport(handler)
+    llm = gateway.get_chat_model("llama3-70b-8192")
+
+    assert gateway.predict_messages(llm, [HumanMessage(content="hi")]) == "hello"
+    assert timeouts == [{'connect': 7.0, 'read': 7.0, 'write': 7.0, 'pool': 7.0}]
+
+
+def test_non_retryable_error_is_not_retried():
+    gateway = make_gateway()
+    attempts = []
+
+    def call():
+        attempts.append(1)
+        raise ValueError("bad payload")
+
+    with pytest.raises(LLMUnavailableError, match="bad payload"):
+        gateway._call_with_retry(call)
+    assert attempts == [1]
+
+
+def test_from_env_rejects_non_positive_settings(monkeypatch):
+    monkeypatch.setenv('LLM_REQUESTS_PER_SECOND', '0')
+    with pytest.raises(ValueError, match="LLM_REQUESTS_PER_SECOND must be greater than 0"):
+        LLMGateway.from_env("test-key")